@@ -1,45 +1,74 @@
 """Main FastAPI app."""
 
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+import hashlib
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Annotated, Optional
+
+from fastapi import Body, Depends, FastAPI, HTTPException, Path, Query, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import AfterValidator, TypeAdapter
+from sqlalchemy import bindparam, delete, lambda_stmt, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.database import get_db, init_db, is_production
+from app.database import auto_create, engine, get_db, init_db
 from app.models import Vehicle
-from app.schemas import VehicleCreate, VehicleResponse, VehicleUpdate
+from app.schemas import VehicleBatchUpdate, VehicleCreate, VehicleResponse, VehicleUpdate
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create tables on startup if APP_AUTO_CREATE=1, and close the pool on shutdown."""
+    if auto_create:
+        await init_db()
+    yield
+    await engine.dispose()
+
+
+app = FastAPI(
+    title="Vehicle API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# VIN path parameter, stripped and uppercased before it reaches the handler
+VinStr = Annotated[str, Path(max_length=17), AfterValidator(lambda s: s.strip().upper())]
 
-app = FastAPI(title="Vehicle API", version="1.0.0")
+# Only the columns the list response needs, so no ORM instances are built
+_LIST_COLUMNS = [getattr(Vehicle, field) for field in VehicleResponse.model_fields]
 
+# Compiled once; validates and serializes a whole page in a single pydantic-core pass
+_VEHICLE_LIST_ADAPTER = TypeAdapter(list[VehicleResponse])
 
-@app.on_event("startup")
-async def startup():
-    """Set up db tables on startup (local dev only)."""
-    # Only auto-create tables for local development
-    # Production/remote databases should use migrations
-    if not is_production:
-        init_db()
+# Cached SELECT-by-VIN; the statement is built and compiled once, not per request
+_VIN_LOOKUP = lambda_stmt(lambda: select(Vehicle)).add_criteria(
+    lambda s: s.where(Vehicle.vin == bindparam("vin"))
+)
 
 
 @app.exception_handler(RequestValidationError)
 async def handle_validation_error(request: Request, exc: RequestValidationError):
     """Catch validation errors and format them nicely."""
-    error_dict = {}
-    for err in exc.errors():
-        # Handle malformed JSON
-        if err["type"] == "json_invalid":
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST, content={"detail": "Invalid JSON format"}
-            )
+    errors = exc.errors()
 
-        # Build field path
-        field_path = ".".join(str(loc) for loc in err["loc"] if loc != "body")
-        if not field_path:
-            field_path = "body"
-        error_dict[field_path] = err["msg"]
+    # Malformed JSON is reported on its own, before any field validation runs
+    if errors and errors[0]["type"] == "json_invalid":
+        return ORJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST, content={"detail": "Invalid JSON format"}
+        )
 
-    return JSONResponse(
+    # Field path -> message, e.g. "horse_power" or "path.vin"
+    error_dict = {
+        ".".join([str(loc) for loc in err["loc"] if loc != "body"]) or "body": err["msg"]
+        for err in errors
+    }
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"errors": error_dict}
     )
 
@@ -47,92 +76,232 @@ async def handle_validation_error(request: Request, exc: RequestValidationError)
 @app.exception_handler(ValueError)
 async def handle_value_error(request: Request, exc: ValueError):
     """Catch value errors."""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"errors": {"detail": str(exc)}}
     )
 
 
-def _normalize_vin(vin: str) -> str:
-    """Make VIN uppercase and strip whitespace."""
-    return vin.upper().strip()
+def vin_cache(request: Request) -> dict:
+    """FastAPI dependency for a request-scoped VIN -> Vehicle lookup cache."""
+    cache = getattr(request.state, "vin_cache", None)
+    if cache is None:
+        cache = request.state.vin_cache = {}
+    return cache
+
+
+async def _fetch_vehicle(db: AsyncSession, vin: str, cache: dict):
+    """Look up a vehicle by VIN, reusing earlier lookups from the same request."""
+    if vin in cache:
+        return cache[vin]
+    vehicle = (await db.execute(_VIN_LOOKUP, {"vin": vin})).scalar_one_or_none()
+    cache[vin] = vehicle
+    return vehicle
+
 
+def _vehicle_etag(vehicle: Vehicle) -> str:
+    """Cheap validator for a vehicle's current version."""
+    version = f"{vehicle.vin}:{vehicle.updated_at.isoformat()}".encode()
+    return f'"{hashlib.blake2b(version, digest_size=8).hexdigest()}"'
 
-@app.get("/vehicle", response_model=list[VehicleResponse])
-def list_vehicles(db: Session = Depends(get_db)):
-    """Get all vehicles."""
-    return db.query(Vehicle).all()
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Weak comparison of an ETag against an If-None-Match header (RFC 9110)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _reject_repeated_vins(vins: list[str]):
+    """Fail a batch request that names the same VIN more than once."""
+    repeated = sorted(vin for vin, count in Counter(vins).items() if count > 1)
+    if repeated:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"errors": {"vin": f"Duplicate VINs in request: {repeated}"}},
+        )
+
+
+def _dialect_insert(db: AsyncSession):
+    """Pick the INSERT construct that supports ON CONFLICT for the bound database."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert
+    return pg_insert
+
+
+@app.get("/vehicle", responses={status.HTTP_200_OK: {"model": list[VehicleResponse]}})
+async def list_vehicles(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a page of vehicles ordered by VIN."""
+    # A page is capped at 1000 rows, so fetch it in one round-trip rather than via a cursor
+    stmt = select(*_LIST_COLUMNS).order_by(Vehicle.vin).offset(offset).limit(limit)
+    rows = (await db.execute(stmt)).all()
+    vehicles = _VEHICLE_LIST_ADAPTER.validate_python(rows, from_attributes=True)
+    return Response(_VEHICLE_LIST_ADAPTER.dump_json(vehicles), media_type="application/json")
 
 
 @app.post("/vehicle", response_model=VehicleResponse, status_code=status.HTTP_201_CREATED)
-def create_vehicle(vehicle: VehicleCreate, db: Session = Depends(get_db)):
+async def create_vehicle(
+    vehicle: VehicleCreate, db: AsyncSession = Depends(get_db), cache: dict = Depends(vin_cache)
+):
     """Create a new vehicle."""
-    vin_upper = _normalize_vin(vehicle.vin)
-
-    # Check for duplicates
-    existing = db.query(Vehicle).filter(Vehicle.vin == vin_upper).first()
-    if existing:
+    # Insert and skip on duplicate VIN in one round-trip
+    insert = _dialect_insert(db)
+    stmt = (
+        insert(Vehicle)
+        .values(**vehicle.model_dump())
+        .on_conflict_do_nothing(index_elements=["vin"])
+        .returning(Vehicle)
+    )
+    new_vehicle = (await db.scalars(stmt)).first()
+    if new_vehicle is None:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail={"errors": {"vin": "Vehicle with this VIN already exists"}},
         )
 
-    # Create the vehicle
-    new_vehicle = Vehicle(
-        vin=vin_upper,
-        manufacturer_name=vehicle.manufacturer_name,
-        description=vehicle.description,
-        horse_power=vehicle.horse_power,
-        model_name=vehicle.model_name,
-        model_year=vehicle.model_year,
-        purchase_price=vehicle.purchase_price,
-        fuel_type=vehicle.fuel_type,
+    await db.commit()
+    cache[vehicle.vin] = new_vehicle
+    return new_vehicle
+
+
+@app.post(
+    "/vehicle/batch",
+    response_model=list[VehicleResponse],
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_vehicles(
+    vehicles: list[VehicleCreate] = Body(..., min_length=1, max_length=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create several vehicles in one statement; fails if any VIN already exists."""
+    _reject_repeated_vins([vehicle.vin for vehicle in vehicles])
+
+    insert = _dialect_insert(db)
+    stmt = (
+        insert(Vehicle)
+        .values([vehicle.model_dump() for vehicle in vehicles])
+        .on_conflict_do_nothing(index_elements=["vin"])
+        .returning(Vehicle)
     )
+    created = (await db.scalars(stmt)).all()
+    if len(created) != len(vehicles):
+        duplicates = sorted({v.vin for v in vehicles} - {vehicle.vin for vehicle in created})
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"errors": {"vin": f"Vehicles with these VINs already exist: {duplicates}"}},
+        )
+
+    await db.commit()
+
+    # Multi-row INSERT ... RETURNING doesn't guarantee row order
+    by_vin = {vehicle.vin: vehicle for vehicle in created}
+    return [by_vin[vehicle.vin] for vehicle in vehicles]
+
+
+@app.put("/vehicle/batch", response_model=list[VehicleResponse])
+async def update_vehicles(
+    vehicle_updates: list[VehicleBatchUpdate] = Body(..., min_length=1, max_length=1000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Update several vehicles by VIN in one executemany round-trip."""
+    vins = [vehicle_update.vin for vehicle_update in vehicle_updates]
+    _reject_repeated_vins(vins)
+
+    # Only update fields that were provided; entries with nothing to change are skipped
+    rows = [vehicle_update.model_dump(exclude_unset=True) for vehicle_update in vehicle_updates]
+    rows = [row for row in rows if len(row) > 1]
 
     try:
-        db.add(new_vehicle)
-        db.commit()
-        db.refresh(new_vehicle)
-        return new_vehicle
+        if rows:
+            await db.execute(update(Vehicle), rows)
+        vehicles = (await db.scalars(select(Vehicle).where(Vehicle.vin.in_(vins)))).all()
+        missing = sorted(set(vins) - {vehicle.vin for vehicle in vehicles})
+        if missing:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"Vehicles not found: {missing}"
+            )
+        await db.commit()
+    except StaleDataError as e:
+        # An UPDATE matched fewer rows than requested, so some VINs don't exist
+        await db.rollback()
+        found = (await db.scalars(select(Vehicle.vin).where(Vehicle.vin.in_(vins)))).all()
+        missing = sorted(set(vins) - set(found))
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Vehicles not found: {missing}"
+        ) from e
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail={"errors": {"vin": "Vehicle with this VIN already exists"}},
+            detail={"errors": {"vin": "Update would violate unique constraint"}},
         ) from e
 
+    by_vin = {vehicle.vin: vehicle for vehicle in vehicles}
+    return [by_vin[vin] for vin in vins]
+
 
-@app.get("/vehicle/{vin}", response_model=VehicleResponse)
-def get_vehicle(vin: str, db: Session = Depends(get_db)):
-    """Get a vehicle by VIN."""
-    vin_upper = _normalize_vin(vin)
-    vehicle = db.query(Vehicle).filter(Vehicle.vin == vin_upper).first()
+@app.get(
+    "/vehicle/{vin}",
+    response_model=VehicleResponse,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Vehicle unchanged"}},
+)
+async def get_vehicle(
+    vin: VinStr,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    cache: dict = Depends(vin_cache),
+):
+    """Get a vehicle by VIN.
+
+    Sends an ETag and answers 304 when the client's If-None-Match still matches.
+    """
+    vehicle = await _fetch_vehicle(db, vin, cache)
 
     if not vehicle:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vehicle not found")
 
+    etag = _vehicle_etag(vehicle)
+    if _etag_matches(etag, request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
     return vehicle
 
 
 @app.put("/vehicle/{vin}", response_model=VehicleResponse)
-def update_vehicle(vin: str, vehicle_update: VehicleUpdate, db: Session = Depends(get_db)):
+async def update_vehicle(
+    vin: VinStr,
+    vehicle_update: VehicleUpdate,
+    db: AsyncSession = Depends(get_db),
+    cache: dict = Depends(vin_cache),
+):
     """Update a vehicle by VIN."""
-    vin_upper = _normalize_vin(vin)
-    vehicle = db.query(Vehicle).filter(Vehicle.vin == vin_upper).first()
-
-    if not vehicle:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vehicle not found")
-
     # Only update fields that were provided
     updates = vehicle_update.model_dump(exclude_unset=True)
-    for key, val in updates.items():
-        setattr(vehicle, key, val)
-
     try:
-        db.commit()
-        db.refresh(vehicle)
+        if updates:
+            stmt = update(Vehicle).where(Vehicle.vin == vin).values(**updates).returning(Vehicle)
+            vehicle = (await db.scalars(stmt)).first()
+            cache[vin] = vehicle
+        else:
+            vehicle = await _fetch_vehicle(db, vin, cache)
+        if not vehicle:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vehicle not found")
+        await db.commit()
         return vehicle
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail={"errors": {"vin": "Update would violate unique constraint"}},
@@ -140,14 +309,16 @@ def update_vehicle(vin: str, vehicle_update: VehicleUpdate, db: Session = Depend
 
 
 @app.delete("/vehicle/{vin}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_vehicle(vin: str, db: Session = Depends(get_db)):
+async def delete_vehicle(
+    vin: VinStr, db: AsyncSession = Depends(get_db), cache: dict = Depends(vin_cache)
+):
     """Delete a vehicle by VIN."""
-    vin_upper = _normalize_vin(vin)
-    vehicle = db.query(Vehicle).filter(Vehicle.vin == vin_upper).first()
+    stmt = delete(Vehicle).where(Vehicle.vin == vin).returning(Vehicle.vin)
+    deleted = (await db.execute(stmt)).first()
+    cache[vin] = None
 
-    if not vehicle:
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vehicle not found")
 
-    db.delete(vehicle)
-    db.commit()
+    await db.commit()
     return None
@@ -1,9 +1,16 @@
 """Database models."""
-from sqlalchemy import Column, Float, Integer, String
+from datetime import datetime, timezone
+
+from sqlalchemy import CheckConstraint, Column, DateTime, Float, Integer, String, func
 
 from app.database import Base
 
 
+def _utcnow() -> datetime:
+    """Current UTC time, with microseconds so back-to-back writes differ."""
+    return datetime.now(timezone.utc)
+
+
 class Vehicle(Base):
     """Vehicle table model.
 
@@ -11,8 +18,11 @@ class Vehicle(Base):
     """
 
     __tablename__ = "vehicles"
+    __table_args__ = (CheckConstraint("vin = upper(vin)", name="vin_upper"),)
+    # Fetch server-generated values via RETURNING on flush instead of a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
-    vin = Column(String(17), primary_key=True, index=True)
+    vin = Column(String(17), primary_key=True)
     manufacturer_name = Column(String(100), nullable=False)
     description = Column(String(500))
     horse_power = Column(Integer, nullable=False)
@@ -20,3 +30,10 @@ class Vehicle(Base):
     model_year = Column(Integer, nullable=False)
     purchase_price = Column(Float, nullable=False)
     fuel_type = Column(String(50), nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=_utcnow,
+        onupdate=_utcnow,
+        server_default=func.now(),
+    )
@@ -1,7 +1,22 @@
 """Pydantic schemas for request/response validation."""
-from typing import Optional
+from typing import Annotated, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, StringConstraints
+
+
+def _upper_vin(v):
+    """Uppercase a VIN before the string constraints run."""
+    if isinstance(v, str):
+        return v.upper()
+    return v
+
+
+# VIN in a request body: uppercased, then stripped and checked by pydantic-core
+Vin = Annotated[
+    str,
+    StringConstraints(strip_whitespace=True, min_length=1, max_length=17, pattern=r"^[A-Z0-9]+$"),
+    BeforeValidator(_upper_vin),
+]
 
 
 class VehicleBase(BaseModel):
@@ -19,20 +34,16 @@ class VehicleBase(BaseModel):
 class VehicleCreate(VehicleBase):
     """Schema for creating a vehicle."""
 
-    vin: str = Field(..., min_length=1, max_length=17)
+    model_config = ConfigDict(str_strip_whitespace=True)
 
-    @field_validator("vin")
-    @classmethod
-    def validate_vin(cls, v):
-        """Normalize and validate VIN."""
-        if not v or not v.strip():
-            raise ValueError("VIN cannot be empty")
-        return v.upper().strip()
+    vin: Vin
 
 
 class VehicleUpdate(BaseModel):
     """Schema for updating a vehicle (all fields optional)."""
 
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     manufacturer_name: Optional[str] = Field(None, min_length=1, max_length=100)
     description: Optional[str] = Field(None, max_length=500)
     horse_power: Optional[int] = Field(None, gt=0)
@@ -42,6 +53,12 @@ class VehicleUpdate(BaseModel):
     fuel_type: Optional[str] = Field(None, min_length=1, max_length=50)
 
 
+class VehicleBatchUpdate(VehicleUpdate):
+    """Schema for one entry of a batch update, identified by VIN."""
+
+    vin: Vin
+
+
 class VehicleResponse(VehicleBase):
     """Schema for vehicle response."""
 
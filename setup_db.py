@@ -2,15 +2,19 @@
 import sys
 
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 
-from app.database import LOCAL_DB_URL, Base
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+from app.database import Base, db_url
+
+# Same database the app uses (DATABASE_URL or the local default), via the sync driver
+SETUP_URL = make_url(db_url).set(drivername="postgresql+psycopg2")
 
 
 def create_database():
-    """Create the vehicles database if it doesn't exist."""
-    db_name = "vehicles"
-    postgres_url = LOCAL_DB_URL.rsplit("/", 1)[0]  # Remove database name
-    admin_engine = create_engine(f"{postgres_url}/postgres", isolation_level="AUTOCOMMIT")
+    """Create the app's database if it doesn't exist."""
+    db_name = SETUP_URL.database
+    admin_engine = create_engine(SETUP_URL.set(database="postgres"), isolation_level="AUTOCOMMIT")
 
     with admin_engine.connect() as conn:
         # Check if database exists
@@ -20,7 +24,7 @@ def create_database():
         exists = result.fetchone()
 
         if not exists:
-            conn.execute(text(f"CREATE DATABASE {db_name}"))
+            conn.execute(text(f'CREATE DATABASE "{db_name}"'))
             print(f"✓ Created database '{db_name}'")
         else:
             print(f"✓ Database '{db_name}' already exists")
@@ -30,7 +34,7 @@ def create_database():
 
 def create_tables():
     """Create all tables in the database."""
-    engine = create_engine(LOCAL_DB_URL)
+    engine = create_engine(SETUP_URL)
     Base.metadata.create_all(bind=engine)
     print("✓ Created tables")
     engine.dispose()
@@ -0,0 +1,101 @@
+"""Shared fixtures for the test suite."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.main import app
+
+# In-memory test database; StaticPool keeps the single connection alive
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite://"
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+# Sessions join the per-test transaction; their commits only release a SAVEPOINT
+TestingSessionLocal = async_sessionmaker(
+    autoflush=False, expire_on_commit=False, join_transaction_mode="create_savepoint"
+)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    """Stop the sqlite driver from managing transactions so SAVEPOINTs work."""
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine.sync_engine, "begin")
+def _emit_begin(conn):
+    """Emit BEGIN ourselves now that the driver no longer does."""
+    conn.exec_driver_sql("BEGIN")
+
+
+async def _run_ddl(fn):
+    """Run a metadata create/drop against the test engine."""
+    async with engine.begin() as conn:
+        await conn.run_sync(fn)
+
+
+async def _begin_test_transaction():
+    """Open a connection and the outer transaction a test runs inside."""
+    conn = await engine.connect()
+    return conn, await conn.begin()
+
+
+async def _rollback_test_transaction(conn, trans):
+    """Throw away everything the test wrote."""
+    await trans.rollback()
+    await conn.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Start the app once and share its client across the whole run."""
+    with TestClient(app) as test_client:
+        yield test_client
+        # The StaticPool connection is bound to this loop, so dispose it
+        # here to stop aiosqlite's worker thread
+        test_client.portal.call(engine.dispose)
+
+
+@pytest.fixture(scope="session")
+def portal(client):
+    """Event loop the app runs on; all db work is scheduled onto it."""
+    return client.portal
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema(portal):
+    """Create the tables once for the whole run."""
+    portal.call(_run_ddl, Base.metadata.create_all)
+    yield
+    portal.call(_run_ddl, Base.metadata.drop_all)
+
+
+@pytest.fixture(autouse=True)
+def connection(portal, schema):
+    """Run each test inside a transaction that is rolled back afterwards.
+
+    Every request gets its own session bound to this connection, like the
+    real get_db, so no ORM state leaks between requests.
+    """
+    conn, trans = portal.call(_begin_test_transaction)
+
+    async def override_get_db():
+        async with TestingSessionLocal(bind=conn) as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield conn
+    app.dependency_overrides.pop(get_db, None)
+    portal.call(_rollback_test_transaction, conn, trans)
+
+
+@pytest.fixture
+def db_session(connection):
+    """Session for tests that talk to the database directly."""
+    return TestingSessionLocal(bind=connection)
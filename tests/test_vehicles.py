@@ -1,36 +1,9 @@
 """Test suite for Vehicle API endpoints."""
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import IntegrityError
 
-from app.database import Base, get_db
-from app.main import app
-
-# Create test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test_vehicles.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def override_get_db():
-    """Override database dependency for testing."""
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-
-app.dependency_overrides[get_db] = override_get_db
-
-
-@pytest.fixture(scope="function")
-def client():
-    """Create test client with fresh database for each test."""
-    Base.metadata.create_all(bind=engine)
-    yield TestClient(app)
-    Base.metadata.drop_all(bind=engine)
+from app.main import _fetch_vehicle
+from app.models import Vehicle
 
 
 @pytest.fixture
@@ -48,25 +21,25 @@ def sample_vehicle():
     }
 
 
-def test_create_vehicle(client, sample_vehicle):
-    """Test creating a vehicle."""
+@pytest.mark.parametrize(
+    "vin_input,expected",
+    [
+        ("1HGBH41JXMN109186", "1HGBH41JXMN109186"),
+        ("1hgbh41jxmn109186", "1HGBH41JXMN109186"),
+        ("  1hgbh41jxmn109186 ", "1HGBH41JXMN109186"),
+    ],
+)
+def test_create_vehicle(client, sample_vehicle, vin_input, expected):
+    """Test creating a vehicle, with the VIN normalized to uppercase."""
+    sample_vehicle["vin"] = vin_input
     response = client.post("/vehicle", json=sample_vehicle)
     assert response.status_code == 201
     data = response.json()
-    assert data["vin"] == sample_vehicle["vin"].upper()
+    assert data["vin"] == expected
     assert data["manufacturer_name"] == sample_vehicle["manufacturer_name"]
     assert data["horse_power"] == sample_vehicle["horse_power"]
 
 
-def test_create_vehicle_vin_normalization(client, sample_vehicle):
-    """Test that VIN is normalized to uppercase."""
-    sample_vehicle["vin"] = "1hgbh41jxmn109186"
-    response = client.post("/vehicle", json=sample_vehicle)
-    assert response.status_code == 201
-    data = response.json()
-    assert data["vin"] == "1HGBH41JXMN109186"
-
-
 def test_create_duplicate_vin(client, sample_vehicle):
     """Test that duplicate VINs are rejected."""
     client.post("/vehicle", json=sample_vehicle)
@@ -93,22 +66,49 @@ def test_get_all_vehicles(client, sample_vehicle):
     assert data[0]["vin"] == sample_vehicle["vin"].upper()
 
 
-def test_get_vehicle_by_vin(client, sample_vehicle):
-    """Test getting a vehicle by VIN."""
+@pytest.mark.parametrize("transform", [str.upper, str.lower])
+def test_get_vehicle_by_vin(client, sample_vehicle, transform):
+    """Test getting a vehicle by VIN, case-insensitively."""
     client.post("/vehicle", json=sample_vehicle)
-    response = client.get(f"/vehicle/{sample_vehicle['vin']}")
+    response = client.get(f"/vehicle/{transform(sample_vehicle['vin'])}")
     assert response.status_code == 200
     data = response.json()
     assert data["vin"] == sample_vehicle["vin"].upper()
 
 
-def test_get_vehicle_by_vin_case_insensitive(client, sample_vehicle):
-    """Test getting a vehicle by VIN is case-insensitive."""
+def test_get_vehicle_not_modified(client, sample_vehicle):
+    """Test that a matching If-None-Match gets a 304 with no body."""
+    client.post("/vehicle", json=sample_vehicle)
+    etag = client.get(f"/vehicle/{sample_vehicle['vin']}").headers["ETag"]
+
+    response = client.get(f"/vehicle/{sample_vehicle['vin']}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("header", ["*", "W/{etag}", '"other", {etag}'])
+def test_get_vehicle_not_modified_weak_and_wildcard(client, sample_vehicle, header):
+    """Test that weak tags, lists and the wildcard also match If-None-Match."""
     client.post("/vehicle", json=sample_vehicle)
-    response = client.get(f"/vehicle/{sample_vehicle['vin'].lower()}")
+    etag = client.get(f"/vehicle/{sample_vehicle['vin']}").headers["ETag"]
+
+    response = client.get(
+        f"/vehicle/{sample_vehicle['vin']}", headers={"If-None-Match": header.format(etag=etag)}
+    )
+    assert response.status_code == 304
+
+
+def test_get_vehicle_etag_changes_on_update(client, sample_vehicle):
+    """Test that an update invalidates the previous ETag."""
+    client.post("/vehicle", json=sample_vehicle)
+    etag = client.get(f"/vehicle/{sample_vehicle['vin']}").headers["ETag"]
+    client.put(f"/vehicle/{sample_vehicle['vin']}", json={"horse_power": 200})
+
+    response = client.get(f"/vehicle/{sample_vehicle['vin']}", headers={"If-None-Match": etag})
     assert response.status_code == 200
-    data = response.json()
-    assert data["vin"] == sample_vehicle["vin"].upper()
+    assert response.headers["ETag"] != etag
+    assert response.json()["horse_power"] == 200
 
 
 def test_get_nonexistent_vehicle(client):
@@ -117,6 +117,13 @@ def test_get_nonexistent_vehicle(client):
     assert response.status_code == 404
 
 
+def test_get_vehicle_vin_too_long(client):
+    """Test that VINs longer than 17 characters are rejected in the path."""
+    response = client.get("/vehicle/" + "A" * 18)
+    assert response.status_code == 422
+    assert "path.vin" in response.json()["errors"]
+
+
 def test_update_vehicle(client, sample_vehicle):
     """Test updating a vehicle."""
     client.post("/vehicle", json=sample_vehicle)
@@ -129,6 +136,14 @@ def test_update_vehicle(client, sample_vehicle):
     assert data["manufacturer_name"] == sample_vehicle["manufacturer_name"]
 
 
+def test_update_vehicle_no_fields(client, sample_vehicle):
+    """Test that an empty update returns the vehicle unchanged."""
+    client.post("/vehicle", json=sample_vehicle)
+    response = client.put(f"/vehicle/{sample_vehicle['vin']}", json={})
+    assert response.status_code == 200
+    assert response.json()["horse_power"] == sample_vehicle["horse_power"]
+
+
 def test_update_nonexistent_vehicle(client):
     """Test updating a non-existent vehicle."""
     update_data = {"horse_power": 200}
@@ -196,6 +211,14 @@ def test_empty_vin(client, sample_vehicle):
     assert response.status_code == 422
 
 
+def test_create_vehicle_invalid_vin_characters(client, sample_vehicle):
+    """Test that VINs with non-alphanumeric characters are rejected."""
+    sample_vehicle["vin"] = "1HGBH41J-MN109186"
+    response = client.post("/vehicle", json=sample_vehicle)
+    assert response.status_code == 422
+    assert "vin" in response.json()["errors"]
+
+
 def test_multiple_vehicles(client, sample_vehicle):
     """Test handling multiple vehicles."""
     # Create first vehicle
@@ -212,3 +235,153 @@ def test_multiple_vehicles(client, sample_vehicle):
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 2
+
+
+def test_create_vehicles_batch(client, sample_vehicle):
+    """Test creating several vehicles in one request."""
+    vehicle2 = {**sample_vehicle, "vin": "2hgbh41jxmn109187", "manufacturer_name": "Toyota"}
+    response = client.post("/vehicle/batch", json=[sample_vehicle, vehicle2])
+    assert response.status_code == 201
+    assert [v["vin"] for v in response.json()] == ["1HGBH41JXMN109186", "2HGBH41JXMN109187"]
+    assert len(client.get("/vehicle").json()) == 2
+
+
+def test_create_vehicles_batch_existing_vin(client, sample_vehicle):
+    """Test that a batch with an existing VIN is rejected as a whole."""
+    client.post("/vehicle", json=sample_vehicle)
+    vehicle2 = {**sample_vehicle, "vin": "2HGBH41JXMN109187"}
+    response = client.post("/vehicle/batch", json=[vehicle2, sample_vehicle])
+    assert response.status_code == 422
+    assert "1HGBH41JXMN109186" in response.json()["detail"]["errors"]["vin"]
+    assert len(client.get("/vehicle").json()) == 1
+
+
+def test_create_vehicles_batch_repeated_vin(client, sample_vehicle):
+    """Test that a batch repeating a VIN is rejected."""
+    response = client.post("/vehicle/batch", json=[sample_vehicle, sample_vehicle])
+    assert response.status_code == 422
+    assert len(client.get("/vehicle").json()) == 0
+
+
+def test_create_vehicles_batch_empty(client):
+    """Test that an empty batch is rejected."""
+    response = client.post("/vehicle/batch", json=[])
+    assert response.status_code == 422
+
+
+def test_update_vehicles_batch(client, sample_vehicle):
+    """Test updating several vehicles in one request."""
+    vehicle2 = {**sample_vehicle, "vin": "2HGBH41JXMN109187"}
+    client.post("/vehicle/batch", json=[sample_vehicle, vehicle2])
+    etag = client.get("/vehicle/1HGBH41JXMN109186").headers["ETag"]
+    updates = [
+        {"vin": "1hgbh41jxmn109186", "horse_power": 200},
+        {"vin": "2HGBH41JXMN109187", "purchase_price": 30000.0},
+    ]
+    response = client.put("/vehicle/batch", json=updates)
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["horse_power"] == 200
+    assert data[1]["purchase_price"] == 30000.0
+    response = client.get("/vehicle/1HGBH41JXMN109186")
+    assert response.json()["horse_power"] == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_update_vehicles_batch_missing_vin(client, sample_vehicle):
+    """Test that a batch update with an unknown VIN changes nothing."""
+    client.post("/vehicle", json=sample_vehicle)
+    updates = [
+        {"vin": sample_vehicle["vin"], "horse_power": 200},
+        {"vin": "INVALID123", "horse_power": 200},
+    ]
+    response = client.put("/vehicle/batch", json=updates)
+    assert response.status_code == 404
+    assert client.get(f"/vehicle/{sample_vehicle['vin']}").json()["horse_power"] == 180
+
+
+def test_update_vehicles_batch_repeated_vin(client, sample_vehicle):
+    """Test that a batch update repeating a VIN is rejected and changes nothing."""
+    client.post("/vehicle", json=sample_vehicle)
+    vin = sample_vehicle["vin"]
+    updates = [{"vin": vin, "horse_power": 1}, {"vin": vin.lower(), "horse_power": 2}]
+    response = client.put("/vehicle/batch", json=updates)
+    assert response.status_code == 422
+    assert vin in response.json()["detail"]["errors"]["vin"]
+    assert client.get(f"/vehicle/{vin}").json()["horse_power"] == 180
+
+
+def test_create_vehicles_batch_request_order(client, sample_vehicle):
+    """Test that batch-created vehicles come back in request order."""
+    vins = ["3HGBH41JXMN109188", "1HGBH41JXMN109186", "2HGBH41JXMN109187"]
+    response = client.post("/vehicle/batch", json=[{**sample_vehicle, "vin": v} for v in vins])
+    assert response.status_code == 201
+    assert [v["vin"] for v in response.json()] == vins
+
+
+def test_update_vehicles_batch_invalid_vin(client):
+    """Test that a malformed VIN in a batch update is a validation error."""
+    response = client.put("/vehicle/batch", json=[{"vin": "1HGBH41J-MN10918", "horse_power": 200}])
+    assert response.status_code == 422
+    assert "0.vin" in response.json()["errors"]
+
+
+def test_update_strips_whitespace_single_and_batch(client, sample_vehicle):
+    """Test that single and batch updates strip string fields the same way."""
+    client.post("/vehicle", json=sample_vehicle)
+    vin = sample_vehicle["vin"]
+
+    response = client.put(f"/vehicle/{vin}", json={"manufacturer_name": "  Honda  "})
+    assert response.json()["manufacturer_name"] == "Honda"
+
+    response = client.put("/vehicle/batch", json=[{"vin": vin, "model_name": "  Civic  "}])
+    assert response.json()[0]["model_name"] == "Civic"
+
+
+def test_fetch_vehicle_reuses_request_cache(client, portal, db_session, sample_vehicle):
+    """Test that repeated VIN lookups within one request hit the cache."""
+    client.post("/vehicle", json=sample_vehicle)
+    vin = sample_vehicle["vin"]
+
+    async def lookup():
+        cache = {"CACHEDVIN": "cached"}
+        async with db_session as db:
+            first = await _fetch_vehicle(db, vin, cache)
+            second = await _fetch_vehicle(db, vin, cache)
+            cached = await _fetch_vehicle(db, "CACHEDVIN", cache)
+        return first, second, cached, cache
+
+    first, second, cached, cache = portal.call(lookup)
+    assert first.vin == vin
+    assert first is second
+    assert cached == "cached"
+    assert cache[vin] is first
+
+
+def test_lowercase_vin_rejected_by_database(portal, db_session, sample_vehicle):
+    """Test that the database refuses VINs that were not uppercased."""
+    sample_vehicle["vin"] = sample_vehicle["vin"].lower()
+
+    async def insert_lowercase():
+        async with db_session as db:
+            db.add(Vehicle(**sample_vehicle))
+            await db.commit()
+
+    with pytest.raises(IntegrityError):
+        portal.call(insert_lowercase)
+
+
+def test_get_vehicles_pagination(client, sample_vehicle):
+    """Test that limit and offset page through vehicles ordered by VIN."""
+    for vin in ("3HGBH41JXMN109188", "1HGBH41JXMN109186", "2HGBH41JXMN109187"):
+        client.post("/vehicle", json={**sample_vehicle, "vin": vin})
+
+    response = client.get("/vehicle", params={"limit": 2, "offset": 1})
+    assert response.status_code == 200
+    assert [v["vin"] for v in response.json()] == ["2HGBH41JXMN109187", "3HGBH41JXMN109188"]
+
+
+def test_get_vehicles_invalid_limit(client):
+    """Test that out-of-range page sizes are rejected."""
+    response = client.get("/vehicle", params={"limit": 0})
+    assert response.status_code == 422